@@ -0,0 +1,118 @@
+import logging
+import numpy as np
+from io import BytesIO
+
+logger = logging.getLogger(__name__)
+
+
+class AudioPreprocessor:
+    """
+    Prepares a recording for Whisper: downmix to mono 16 kHz, trim leading/trailing
+    silence with a frame-energy VAD, split long recordings at quiet points and encode
+    each chunk to a compact codec. preprocess() returns a list of (filename, bytes)
+    tuples ready to pass as `file=` to the OpenAI audio endpoints.
+    """
+
+    SAMPLE_RATE = 16_000
+    FRAME_MS = 30
+    PADDING_MS = 200                 # kept around detected speech so words are not clipped
+    ABSOLUTE_THRESHOLD_DB = -50      # frames quieter than this are always silence (dBFS)
+    NOISE_MARGIN_DB = 10             # speech must be this far above the noise floor
+    MAX_CHUNK_SECONDS = 60
+    SPLIT_SEARCH_SECONDS = 15        # look this far back from a chunk limit for a quiet cut point
+
+    # Tried in order; the last one needs no ffmpeg encoder
+    EXPORT_FORMATS = [
+        {"format": "ogg", "codec": "libopus", "bitrate": "24k"},
+        {"format": "mp3", "bitrate": "32k"},
+        {"format": "wav"},
+    ]
+    # First format that encoded successfully, tried first from then on
+    _export_format = None
+
+    def __init__(self, audio_path):
+        self.audio_path = audio_path
+        self.audio = None
+        self.frame_db = None
+
+    def preprocess(self):
+        self._load()
+        self._compute_frame_energy()
+        if not self._trim_silence():
+            return []
+        return [
+            self._encode(chunk, index)
+            for index, chunk in enumerate(self._split_chunks())
+        ]
+
+    def _load(self):
+        from pydub import AudioSegment
+        audio = AudioSegment.from_file(self.audio_path)
+        self.audio = audio.set_channels(1).set_frame_rate(self.SAMPLE_RATE).set_sample_width(2)
+
+    def _compute_frame_energy(self):
+        samples = np.array(self.audio.get_array_of_samples(), dtype=np.float32) / 32768.0
+        frame_len = self.SAMPLE_RATE * self.FRAME_MS // 1000
+        n_frames = len(samples) // frame_len
+        if n_frames == 0:
+            self.frame_db = np.array([])
+            return
+        frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+        rms = np.sqrt(np.mean(frames ** 2, axis=1))
+        self.frame_db = 20 * np.log10(rms + 1e-10)
+
+    def _speech_mask(self, frame_db):
+        noise_floor = np.percentile(frame_db, 10)
+        peak = frame_db.max()
+        threshold = max(self.ABSOLUTE_THRESHOLD_DB, min(noise_floor + self.NOISE_MARGIN_DB, peak - self.NOISE_MARGIN_DB))
+        return frame_db > threshold
+
+    def _trim_silence(self):
+        if self.frame_db.size == 0:
+            return False
+        speech_frames = np.flatnonzero(self._speech_mask(self.frame_db))
+        if speech_frames.size == 0:
+            return False
+
+        # Start on a frame boundary so frame_db stays aligned with the trimmed audio
+        start_ms = max(speech_frames[0] * self.FRAME_MS - self.PADDING_MS, 0)
+        start_ms -= start_ms % self.FRAME_MS
+        end_ms = min((speech_frames[-1] + 1) * self.FRAME_MS + self.PADDING_MS, len(self.audio))
+        self.audio = self.audio[start_ms:end_ms]
+
+        first_frame = start_ms // self.FRAME_MS
+        self.frame_db = self.frame_db[first_frame:first_frame + len(self.audio) // self.FRAME_MS]
+        return True
+
+    def _split_chunks(self):
+        max_frames = self.MAX_CHUNK_SECONDS * 1000 // self.FRAME_MS
+        search_frames = self.SPLIT_SEARCH_SECONDS * 1000 // self.FRAME_MS
+        n_frames = len(self.frame_db)
+
+        chunks = []
+        start = 0
+        while n_frames - start > max_frames:
+            # Cut at the quietest frame shortly before the limit, so words are not split
+            window = self.frame_db[start + max_frames - search_frames:start + max_frames]
+            cut = start + max_frames - search_frames + int(np.argmin(window))
+            chunks.append(self.audio[start * self.FRAME_MS:cut * self.FRAME_MS])
+            start = cut
+        chunks.append(self.audio[start * self.FRAME_MS:])
+        return chunks
+
+    def _encode(self, chunk, index):
+        cached = AudioPreprocessor._export_format
+        formats = self.EXPORT_FORMATS if cached is None else [cached] + [f for f in self.EXPORT_FORMATS if f is not cached]
+        for options in formats:
+            buf = BytesIO()
+            try:
+                chunk.export(buf, **options)
+            except Exception as e:
+                # Encoder not available in this ffmpeg build (or no ffmpeg at all)
+                logger.warning("Could not encode audio as %s, trying the next format: %s", options["format"], e)
+                continue
+            data = buf.getvalue()
+            AudioPreprocessor._export_format = options
+            logger.info("Encoded %.1fs audio chunk as %s (%d bytes)", len(chunk) / 1000, options["format"], len(data))
+            return f"chunk_{index}.{options['format']}", data
+        raise RuntimeError("Could not encode audio in any supported format.")
@@ -0,0 +1,205 @@
+import os
+import gc
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+from .patient import Patient, load_pyplot
+from .payload_encoder import PayloadEncoder
+from .data_preprocessor import load_data, DATASET_DIR
+
+import warnings
+warnings.filterwarnings("ignore")
+
+RESULTS_FILE = "results.jsonl"
+PARQUET_FILE = "results.parquet"
+PLOTS_DIR = "plots"
+
+
+def process_patient(patient_id, out_dir, plots=False, token_stats=False):
+    """
+    Summary, vitals analysis and (optionally) PNG plots and tool payload token counts
+    for one patient.
+    Errors are returned in the record rather than raised, so one bad patient
+    does not stop the batch.
+    """
+    start = time.perf_counter()
+    record = {"patient_id": patient_id}
+    try:
+        patient = Patient(patient_id)
+        record["name"] = f"{patient.first_name} {patient.last_name}"
+        record["summary"] = patient.get_valid_summary()
+        record["analysis"] = patient.analyze_vitals()
+        if token_stats:
+            record["token_savings"] = PayloadEncoder(patient).token_savings()
+
+        if plots:
+            record["plots"] = []
+            for kind, render in [
+                ("vitals", lambda: patient.generate_vitals_plot(as_bytes=True)),
+                # Reuse the analysis above instead of running analyze_vitals() again
+                ("out_of_range", lambda: patient.plot_out_of_range(as_bytes=True, analysis=record["analysis"])),
+            ]:
+                image = render()
+                if image is None:
+                    continue
+                path = os.path.join(out_dir, PLOTS_DIR, f"{patient_id}_{kind}.png")
+                with open(path, "wb") as f:
+                    f.write(image)
+                record["plots"].append(os.path.relpath(path, out_dir))
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def completed_patients(results_path):
+    # Patients already written without an error are skipped on resume. A line cut off
+    # by an interrupted run is ignored, so that patient is simply processed again.
+    done = set()
+    if not os.path.exists(results_path):
+        return done
+    with open(results_path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "error" not in record:
+                done.add(record["patient_id"])
+    return done
+
+
+def write_parquet(results_path, parquet_path):
+    records = {}
+    with open(results_path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            # Later lines (retries after errors) replace earlier ones
+            records[record["patient_id"]] = record
+
+    df = pd.DataFrame(list(records.values()))
+    # Nested structures are stored as JSON strings to keep a flat schema
+    for column in ["analysis", "token_savings", "plots"]:
+        if column in df:
+            df[column] = df[column].map(lambda value: json.dumps(value) if isinstance(value, (dict, list)) else None)
+    try:
+        df.to_parquet(parquet_path, index=False)
+    except ImportError as e:
+        raise ImportError("Writing Parquet requires pyarrow: pip install pyarrow") from e
+
+
+def select_patients(patient_ids=None, patients_file=None):
+    # Returns the selected dataset IDs and any requested IDs that are not in the dataset
+    ids = Patient.patients["Id"].tolist()
+    wanted = set(patient_ids or [])
+    if patients_file:
+        with open(patients_file, "r") as f:
+            wanted.update(line.strip() for line in f if line.strip())
+    if not wanted:
+        return ids, []
+    unknown = sorted(wanted.difference(ids))
+    return [patient_id for patient_id in ids if patient_id in wanted], unknown
+
+
+def run_batch(out_dir, patient_ids=None, patients_file=None, plots=False, token_stats=False, workers=None, output_format="jsonl", dataset_dir=DATASET_DIR):
+    start = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    if plots:
+        os.makedirs(os.path.join(out_dir, PLOTS_DIR), exist_ok=True)
+
+    load_data(dataset_dir)
+    ids, unknown = select_patients(patient_ids, patients_file)
+    for patient_id in unknown:
+        print(f"[batch] warning: unknown patient ID {patient_id!r}, skipped")
+    results_path = os.path.join(out_dir, RESULTS_FILE)
+    done = completed_patients(results_path)
+    pending = [patient_id for patient_id in ids if patient_id not in done]
+    print(f"[batch] {len(ids)} patients selected, {len(ids) - len(pending)} already done, {len(pending)} to process")
+
+    # Load the tokenizer and plotting stack once before forking so every worker inherits
+    # them, and keep the shared tables out of the cyclic GC (see app.main.run_workers).
+    Patient.get_encoding()
+    if plots:
+        load_pyplot()
+    gc.freeze()
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    else:
+        # Without fork each worker has to load its own copy of the dataset
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=load_data, initargs=(dataset_dir,))
+
+    errors = 0
+    seconds = 0.0
+    markdown_tokens = 0
+    compact_tokens = 0
+    processing_start = time.perf_counter()
+    with pool, open(results_path, "a") as results:
+        futures = [pool.submit(process_patient, patient_id, out_dir, plots, token_stats) for patient_id in pending]
+        for n, future in enumerate(as_completed(futures), start=1):
+            record = future.result()
+            results.write(json.dumps(record) + "\n")
+            results.flush()
+
+            seconds += record["seconds"]
+            if "token_savings" in record:
+                markdown_tokens += record["token_savings"]["markdown_tokens"]
+                compact_tokens += record["token_savings"]["compact_tokens"]
+            status = "ok"
+            if "error" in record:
+                errors += 1
+                status = f"error ({record['error']})"
+            elapsed = time.perf_counter() - processing_start
+            rate = n / elapsed if elapsed else 0.0
+            eta = (len(pending) - n) / rate if rate else 0.0
+            print(f"[{n}/{len(pending)}] {record['patient_id']} {status} -- {rate:.2f} patients/s, eta {eta:.0f}s")
+
+    if output_format == "parquet":
+        write_parquet(results_path, os.path.join(out_dir, PARQUET_FILE))
+
+    wall = time.perf_counter() - start
+    processed = len(pending)
+    print(
+        f"[batch] processed {processed} patients ({errors} errors, {len(unknown)} unknown IDs) in {wall:.1f}s"
+        + (f" -- {processed / wall:.2f} patients/s, {seconds / processed:.2f}s mean per patient" if processed else "")
+    )
+    if markdown_tokens:
+        print(
+            f"[batch] tool payload tokens: {markdown_tokens} markdown vs {compact_tokens} compact "
+            f"({100 * (markdown_tokens - compact_tokens) / markdown_tokens:.1f}% saved)"
+        )
+    # Unknown IDs count as failures too, so a mistyped ID gives a non-zero exit code
+    return errors + len(unknown)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch patient summaries and vitals analyses without the UI.")
+    parser.add_argument("--out", default="batch_output", help="Output directory (results.jsonl, results.parquet, plots/).")
+    parser.add_argument("--patients", nargs="*", help="Only process these patient IDs.")
+    parser.add_argument("--patients-file", help="File with one patient ID per line to process.")
+    parser.add_argument("--plots", action="store_true", help="Also write vitals and out-of-range PNG plots.")
+    parser.add_argument("--token-stats", action="store_true", help="Also record tool payload tokens, markdown vs compact (slower).")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: number of CPUs).")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl", help="Also write results.parquet when 'parquet' (requires pyarrow).")
+    parser.add_argument("--dataset-dir", default=DATASET_DIR, help="Directory with the Synthea CSV files.")
+    args = parser.parse_args()
+
+    errors = run_batch(
+        args.out,
+        patient_ids=args.patients,
+        patients_file=args.patients_file,
+        plots=args.plots,
+        token_stats=args.token_stats,
+        workers=args.workers,
+        output_format=args.format,
+        dataset_dir=args.dataset_dir,
+    )
+    raise SystemExit(1 if errors else 0)
@@ -1,24 +1,42 @@
 import json
 import os
+import threading
 from dotenv import load_dotenv
-from openai import OpenAI
 import numpy as np
 from io import BytesIO
-from pydub import AudioSegment
+from concurrent.futures import ThreadPoolExecutor
+from .audio_preprocessor import AudioPreprocessor
 from .tools import tools, handle_tool_call, get_vital_plots, get_plot_out_of_range
 
 load_dotenv(override=True)
 openai_api_key = os.getenv('OPENAI_API_KEY')
 if not openai_api_key:
     raise ValueError("OPENAI_API_KEY is not set. Please create a .env file with your API key.")
-openai = OpenAI(api_key=openai_api_key)
+
+# The OpenAI client (and its httpx stack) is built on first use, so importing this
+# module stays cheap and forked workers each create their own connection pool.
+_openai = None
+_openai_lock = threading.Lock()
+
+def get_openai():
+    global _openai
+    if _openai is None:
+        with _openai_lock:
+            if _openai is None:
+                from openai import OpenAI
+                _openai = OpenAI(api_key=openai_api_key)
+    return _openai
 
 MODEL = "gpt-4o-mini"
 system_prompt = '''You are a helpful medical assistant. Give brief, accurate answers. If you don't know the answer, say so.
                 Do not make anything up if you haven't been provided with relevant context.'''
 
 def chat(history):
+    # Nothing new to answer (e.g. a voice message with no speech was dropped)
+    if not history or history[-1]["role"] != "user":
+        return history, None
 
+    openai = get_openai()
     messages = [{"role": "system", "content": system_prompt}] + history 
     response = openai.chat.completions.create(model=MODEL, messages=messages, tools=tools)
     image = None
@@ -47,6 +65,9 @@ def chat(history):
 
 
 def talker(message):
+    from pydub import AudioSegment
+
+    openai = get_openai()
     response = openai.audio.speech.create(
         model="tts-1",
         voice="onyx",
@@ -60,15 +81,32 @@ def talker(message):
     return audio_segment.frame_rate, samples
 
 def transcribe_audio(audio_path):
-    with open(audio_path, "rb") as audio_file:
+    openai = get_openai()
+    # Trimmed, mono 16 kHz, compressed chunks instead of the raw recording
+    chunks = AudioPreprocessor(audio_path).preprocess()
+    if not chunks:
+        return ""
+
+    def _transcribe(chunk):
         transcript = openai.audio.translations.create(
             model="whisper-1", 
-            file=audio_file,
+            file=chunk,
         )
-    return transcript.text
+        return transcript.text.strip()
+
+    # Chunks are transcribed concurrently and stitched back in order
+    with ThreadPoolExecutor(max_workers=min(len(chunks), 4)) as executor:
+        texts = list(executor.map(_transcribe, chunks))
+    return " ".join(text for text in texts if text)
 
 def submit_audio(audio_path, history):
     text = transcribe_audio(audio_path)
+    if not text:
+        # Shown as a toast rather than added to history, so the model never sees it;
+        # chat() then skips because the last message isn't the user's
+        import gradio as gr
+        gr.Warning("No speech detected in the recording. Please try again.")
+        return "", history
     history += [{"role": "user", "content": text}]
     return "", history
 
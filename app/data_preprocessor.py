@@ -1,8 +1,15 @@
+import os
 import pandas as pd
+from .patient import Patient
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+DATASET_DIR = os.path.join(BASE_DIR, "dataset")
+
 
 class DataPreprocessor:
     
-    def __init__(self, patients, immunizations, medications, observations):
+    def __init__(self, patients, immunizations, medications, observations, arrow_strings=False):
+        self.arrow_strings = arrow_strings
         self.patients = patients
         self.immunizations = immunizations
         self.medications = medications
@@ -13,6 +20,8 @@ class DataPreprocessor:
         self._clean_immunizations()
         self._clean_medications()
         self._process_observations()
+        if self.arrow_strings:
+            self._to_arrow_strings()
         return self.patients, self.immunizations, self.medications, self.observations
 
     def _clean_patients(self):
@@ -33,3 +42,34 @@ class DataPreprocessor:
         obs['new_admission'] = (obs['time_diff'] > pd.Timedelta(days=1)) 
         obs['ADMISSION_ID'] = obs.groupby('PATIENT')['new_admission'].cumsum().astype(int)
         self.observations = obs.drop(columns=['new_admission','time_diff'])
+
+    def _to_arrow_strings(self):
+        # Object columns hold one Python str per cell, and every full-column filter such as
+        # `observations["PATIENT"] == id` updates their reference counts, which dirties the
+        # pages forked workers share. Arrow-backed strings live in plain buffers instead.
+        # Only worth it before forking: per-patient filtering and analysis run slower on them.
+        tables = []
+        for table in [self.patients, self.immunizations, self.medications, self.observations]:
+            table = table.copy()
+            for column in table.select_dtypes(include="object").columns:
+                table[column] = table[column].astype("string[pyarrow]")
+            tables.append(table)
+        self.patients, self.immunizations, self.medications, self.observations = tables
+
+
+def load_data(dataset_dir=DATASET_DIR, arrow_strings=False):
+
+    patients = pd.read_csv(os.path.join(dataset_dir, 'patients.csv'))
+    immunizations = pd.read_csv(os.path.join(dataset_dir, 'immunizations.csv'))
+    medications = pd.read_csv(os.path.join(dataset_dir, 'medications.csv'))
+    observations = pd.read_csv(os.path.join(dataset_dir, 'observations.csv'))
+
+    # Preprocess
+    preprocessor = DataPreprocessor(patients, immunizations, medications, observations, arrow_strings=arrow_strings)
+    patients, immunizations, medications, observations = preprocessor.preprocess()
+
+    # Assign to Patient class
+    Patient.patients = patients
+    Patient.immunizations = immunizations
+    Patient.medications = medications
+    Patient.observations = observations
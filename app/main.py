@@ -1,9 +1,15 @@
-import os
-import pandas as pd
-import gradio as gr
+import time
+_IMPORT_START = time.perf_counter()
 
-from .patient import Patient
-from .data_preprocessor import DataPreprocessor
+import os
+import gc
+import argparse
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+from .patient import Patient, load_pyplot
+from .data_preprocessor import load_data
 from .chat_audio import (
         chat,
         talker,
@@ -16,25 +22,46 @@ from .chat_audio import (
 import warnings
 warnings.filterwarnings("ignore")
 
-def run_chatbot():
+_IMPORT_TIME = time.perf_counter() - _IMPORT_START
+
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    yield
+    print(f"[startup] {stage}: {time.perf_counter() - start:.2f}s")
 
-    BASE_DIR = os.path.dirname(os.path.dirname(__file__))
-    DATASET_DIR = os.path.join(BASE_DIR, "dataset")
 
-    patients = pd.read_csv(os.path.join(DATASET_DIR, 'patients.csv'))
-    immunizations = pd.read_csv(os.path.join(DATASET_DIR, 'immunizations.csv'))
-    medications = pd.read_csv(os.path.join(DATASET_DIR, 'medications.csv'))
-    observations = pd.read_csv(os.path.join(DATASET_DIR, 'observations.csv'))
+def prewarm():
+    """
+    Load the tokenizer, plotting stack, audio stack and OpenAI client in a background
+    thread so the first request that needs them does not pay the import cost.
+    """
+    def _warm():
+        from .chat_audio import get_openai
+        for stage, func in [
+            ("tokenizer", Patient.get_encoding),
+            ("matplotlib", load_pyplot),
+            ("pydub", lambda: __import__("pydub")),
+            ("openai client", get_openai),
+        ]:
+            try:
+                with timed(f"prewarm {stage}"):
+                    func()
+            except Exception as e:
+                # Not fatal: the request that needs it will load it (and surface the error)
+                print(f"[startup] prewarm {stage} failed: {e}")
 
-    # Preprocess
-    preprocessor = DataPreprocessor(patients, immunizations, medications, observations)
-    patients, immunizations, medications, observations = preprocessor.preprocess()
+    thread = threading.Thread(target=_warm, name="prewarm", daemon=True)
+    thread.start()
+    return thread
 
-    # Assign to Patient class
-    Patient.patients = patients
-    Patient.immunizations = immunizations
-    Patient.medications = medications
-    Patient.observations = observations
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+
+def build_ui():
+    import gradio as gr
 
     css_path = os.path.join(BASE_DIR, "app", "styles.css")
     with open(css_path, "r") as f:
@@ -44,7 +71,8 @@ def run_chatbot():
         gr.Markdown("# HealthBot Assistant")
         with gr.Row():
             chatbot = gr.Chatbot(height=500, type="messages")  #
-            image_output = gr.Image(height=500)                
+            # Plots are sent to the browser as WebP (about 3-4x smaller than PNG)
+            image_output = gr.Image(height=500, format="webp")
         with gr.Row():
             entry = gr.Textbox(label="Chat with our AI Health Assistant:", elem_id="chat-entry", lines=5)  
             send_btn = gr.Button("📩 Send Message", elem_id="send-btn")
@@ -99,9 +127,87 @@ def run_chatbot():
             queue=False
         )
 
-
-    ui.launch(inbrowser=True)
+    return ui
+
+
+def _serve_worker(port, host=None):
+    # Runs in a forked child: the Patient tables are inherited from the parent
+    # and only read from here, so their pages stay shared with the other workers.
+    # Threads do not survive fork, so each worker starts its own prewarm.
+    start = time.perf_counter()
+    prewarm()
+    with timed(f"worker {port} build ui"):
+        ui = build_ui()
+    with timed(f"worker {port} launch"):
+        ui.launch(server_name=host, server_port=port, inbrowser=False, prevent_thread_lock=True)
+    print(f"[startup] worker {port} ready to serve after {time.perf_counter() - start:.2f}s from fork")
+    ui.block_thread()
+
+
+def run_workers(workers, port=None, host=None):
+    """
+    Load the dataset once, then fork `workers` Gradio servers on consecutive ports
+    (port, port + 1, ...). Put a load balancer with sticky sessions (e.g. nginx
+    `ip_hash`) in front of them, since a Gradio queue session must stay on one worker.
+    Like single-process mode, workers listen on Gradio's default host unless `host` is given.
+    """
+    if "fork" not in multiprocessing.get_all_start_methods():
+        raise RuntimeError("Multi-worker mode requires the 'fork' start method (Linux/macOS).")
+
+    port = port or 7860
+    print(f"[startup] imports: {_IMPORT_TIME:.2f}s")
+    with timed("load data"):
+        # Arrow-backed strings so the tables stay shared after fork (see DataPreprocessor)
+        load_data(arrow_strings=True)
+    # Import the heavy stacks before forking so every worker inherits them instead
+    # of paying the import cost again (no threads here: they would not survive fork).
+    # The OpenAI client itself is still built per worker, after fork.
+    with timed("preload shared modules"):
+        __import__("gradio")
+        __import__("openai")
+        Patient.get_encoding()
+        load_pyplot()
+        __import__("pydub")
+    # Move everything loaded so far into the permanent generation so the cyclic GC
+    # in the workers never touches (and thereby copies) the shared DataFrame pages.
+    gc.freeze()
+
+    ctx = multiprocessing.get_context("fork")
+    processes = [ctx.Process(target=_serve_worker, args=(port + i, host), daemon=False) for i in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+def run_chatbot(port=None, host=None):
+    start = time.perf_counter()
+    print(f"[startup] imports: {_IMPORT_TIME:.2f}s")
+    prewarm()
+    with timed("load data"):
+        load_data()
+    with timed("build ui"):
+        ui = build_ui()
+    with timed("launch"):
+        ui.launch(server_name=host, server_port=port, inbrowser=True, prevent_thread_lock=True)
+    print(f"[startup] ready to serve after {time.perf_counter() - start + _IMPORT_TIME:.2f}s")
+    ui.block_thread()
 
 
 if __name__ == "__main__":
-    run_chatbot()
+    parser = argparse.ArgumentParser(description="HealthBot Assistant")
+    parser.add_argument("--workers", type=int, default=1, help="Number of forked server processes sharing one copy of the dataset.")
+    parser.add_argument("--port", type=int, default=None, help="Server port (default: Gradio's, or 7860 for the first worker); further workers use the following ports.")
+    parser.add_argument("--host", default=None, help="Interface to listen on (default: Gradio's default, localhost).")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        run_workers(args.workers, port=args.port, host=args.host)
+    else:
+        run_chatbot(port=args.port, host=args.host)
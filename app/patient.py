@@ -1,15 +1,22 @@
 from datetime import datetime, date
 import json
-import tiktoken
 import io
+import threading
 import pandas as pd
 import numpy as np
-from PIL import Image
-import matplotlib.pyplot as plt
 from collections import defaultdict
 from io import BytesIO
 
 
+def load_pyplot():
+    # matplotlib/PIL are only needed for the plotting tools, so import them on first use.
+    # Agg avoids probing for a GUI backend in server/worker processes.
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
 class Patient:
 
     patients = None
@@ -17,7 +24,10 @@ class Patient:
     observations = None
     medications = None
 
-    encoding = tiktoken.encoding_for_model("gpt-4o")
+    # Tokenizer is loaded lazily by get_encoding() (or by the startup prewarm thread)
+    encoding = None
+    _encoding_lock = threading.Lock()
+
     VITAL_SIGNS = [
         "Diastolic Blood Pressure",
         "Systolic Blood Pressure", 
@@ -31,6 +41,11 @@ class Patient:
         "Body mass index (BMI) [Ratio]"
     ]
 
+    # Plot rendering: series longer than the axis pixel width are downsampled, and
+    # markers are only drawn when a series is short enough for them to be readable
+    PLOT_DPI = 100
+    MARKER_MAX_POINTS = 60
+
     # Define fixed colours for each measurement
     COLOR_MAP = {
         "Body Height": "#0084ff",
@@ -73,6 +88,16 @@ class Patient:
     }
 
 
+    @classmethod
+    def get_encoding(cls):
+        if cls.encoding is None:
+            with cls._encoding_lock:
+                if cls.encoding is None:
+                    import tiktoken
+                    cls.encoding = tiktoken.encoding_for_model("gpt-4o")
+        return cls.encoding
+
+
     def __init__(self, patient_id):
         self.patient_id = patient_id
         patient_rows = Patient.patients[Patient.patients["Id"] == self.patient_id].copy()
@@ -183,35 +208,114 @@ class Patient:
         ])
 
     def get_valid_summary(self, max_entries=None):
+        encoding = self.get_encoding()
         summary_text = self.get_summary()
-        tokens = self.encoding.encode(summary_text)
+        tokens = encoding.encode(summary_text)
         
         if len(tokens) >= 200_000:
             summary_text = self.get_summary(max_entries=200)
-            tokens = self.encoding.encode(summary_text)
+            tokens = encoding.encode(summary_text)
 
         return summary_text
 
 
-    def plot_patient_metrics(self, axis, measures, filtered_obs, title, bbox_to_anchor, ncol):
+    @staticmethod
+    def _minmax_indices(values, max_points):
+        # Lowest and highest value of each of max_points // 2 equal-width buckets
+        n = len(values)
+        if n <= max_points:
+            return np.arange(n)
+        n_buckets = max(max_points // 2, 1)
+        edges = np.linspace(0, n, n_buckets + 1).astype(int)
+        keep = []
+        for lo, hi in zip(edges[:-1], edges[1:]):
+            if hi <= lo:
+                continue
+            bucket = values[lo:hi]
+            keep.append(lo + int(np.argmin(bucket)))
+            keep.append(lo + int(np.argmax(bucket)))
+        return np.unique(keep)
+
+    @staticmethod
+    def downsample_series(values, max_points, keep_mask=None):
+        """
+        Min/max bucketing down to at most max_points indices, keeping the first/last points.
+        Points in keep_mask (e.g. abnormal readings) are all kept while they fit in half the
+        budget; beyond that they are bucketed on their own, which keeps the most extreme ones.
+        Returns the sorted positional indices to plot.
+        """
+        values = np.asarray(values, dtype=float)
+        n = len(values)
+        if max_points is None or n <= max_points:
+            return np.arange(n)
+
+        kept = np.flatnonzero(np.asarray(keep_mask, dtype=bool)) if keep_mask is not None else np.array([], dtype=int)
+        kept_budget = max(max_points // 2, 1)
+        if len(kept) > kept_budget:
+            kept = kept[Patient._minmax_indices(values[kept], kept_budget)]
+
+        rest = Patient._minmax_indices(values, max(max_points - len(kept) - 2, 2))
+        return np.union1d(np.union1d(kept, rest), [0, n - 1])
+
+    def plot_patient_metrics(self, axis, measures, filtered_obs, title, bbox_to_anchor, ncol, max_points=None):
+        # Default to roughly one point per horizontal pixel of the axis
+        if max_points is None:
+            max_points = max(int(axis.get_window_extent().width), 2)
+
         for desc in measures:
             subset = filtered_obs[filtered_obs["DESCRIPTION"] == desc]
             if subset.empty:
                 continue
-            dates = subset["DATE"]
             values = pd.to_numeric(subset["VALUE"], errors="coerce")
+            valid = values.notna()
+            dates = subset["DATE"][valid]
+            values = values[valid]
+            if values.empty:
+                continue
+
+            # Abnormal readings are always kept so downsampling never hides them
+            limits = Patient.VITAL_SIGNS_NORMAL_RANGES.get(desc)
+            keep_mask = ((values < limits["min"]) | (values > limits["max"])) if limits else None
+            indices = Patient.downsample_series(values, max_points, keep_mask)
+            dates = dates.iloc[indices]
+            values = values.iloc[indices]
+
             unit = subset["UNITS"].dropna().iloc[0] if not subset["UNITS"].dropna().empty else ""
             label = f"{desc} ({unit})" 
-            axis.plot(dates, values, marker='o', label=label, color=Patient.COLOR_MAP.get(desc, 'gray'))
+            marker = 'o' if len(values) <= Patient.MARKER_MAX_POINTS else None
+            axis.plot(dates, values, marker=marker, markersize=4, linewidth=1.2, label=label, color=Patient.COLOR_MAP.get(desc, 'gray'))
         
         axis.set_title(f"{title} for {self.first_name} {self.last_name}")
         axis.set_ylabel("Measurement")
         axis.legend(loc='lower center', bbox_to_anchor=bbox_to_anchor, ncol=ncol, frameon=False)
         axis.grid(True)
 
-    def plot_out_of_range(self):
+    @staticmethod
+    def render_figure(fig, as_bytes=False):
+        """
+        Rasterize and close a figure. Returns a PIL image (what gr.Image expects, which
+        re-encodes it as WebP for the browser) or, with as_bytes=True, the PNG bytes.
+        """
+        plt = load_pyplot()
+        from PIL import Image
 
-        fig, ax = plt.subplots(figsize=(10, 6))
+        buf = BytesIO()
+        fig.savefig(buf, format="png", dpi=Patient.PLOT_DPI, bbox_inches="tight")
+        plt.close(fig)
+        if as_bytes:
+            return buf.getvalue()
+        buf.seek(0)
+        return Image.open(buf)
+
+    def plot_out_of_range(self, max_points=None, as_bytes=False, analysis=None):
+        out_of_range_points = self.extract_out_of_range_points(analysis)
+        if not out_of_range_points:
+            return None  # No data to plot
+
+        plt = load_pyplot()
+        fig, ax = plt.subplots(figsize=(10, 6), dpi=Patient.PLOT_DPI)
+        if max_points is None:
+            max_points = max(int(ax.get_window_extent().width), 2)
         
         self.plot_patient_metrics(
             axis=ax,
@@ -219,47 +323,43 @@ class Patient:
             filtered_obs=Patient.observations[Patient.observations["PATIENT"] == self.patient_id],
             title="Vital Signs",
             bbox_to_anchor=(0.5, -0.3),
-            ncol=4
+            ncol=4,
+            max_points=max_points
+        )
+
+        # Plot out-of-range points in red, as a single artist, downsampled per vital sign
+        # with the same point budget as the lines
+        points = pd.DataFrame(out_of_range_points)
+        points["DATE"] = pd.to_datetime(points["DATE"]).dt.tz_localize(None)
+        points = points.sort_values("DATE")
+        points = pd.concat([
+            group.iloc[Patient.downsample_series(group["VALUE"], max_points)]
+            for _, group in points.groupby("vital_sign", sort=False)
+        ])
+        ax.plot(
+            points["DATE"],
+            points["VALUE"],
+            marker='o',
+            color='red',
+            markersize=8,
+            linestyle='None',
+            label='Out of Range'
         )
-        
-        out_of_range_points = self.extract_out_of_range_points()
-        if not out_of_range_points:
-            return None  # No data to plot
-        labeled = False
-        # Plot out-of-range points in red
-        for point in out_of_range_points:
-            date = pd.to_datetime(point["DATE"]).tz_localize(None)
-            ax.plot(
-                date,
-                point["VALUE"],
-                marker='o',
-                color='red',
-                markersize=8,
-                linestyle='None',
-                label='Out of Range' if not labeled else None
-            )
-            labeled = True
 
         plt.tight_layout()
         ax.legend(loc='lower center', bbox_to_anchor=(0.5, -0.25), ncol=3, frameon=False)
 
-        
-        buf = BytesIO()
-        fig.savefig(buf, format="PNG", bbox_inches="tight")
-        plt.close(fig)
-        buf.seek(0)
-        return Image.open(buf)
+        return Patient.render_figure(fig, as_bytes=as_bytes)
 
 
-    def generate_vitals_plot(self, start_date=None, end_date=None):
-    
+    def filter_vitals(self, start_date=None, end_date=None):
         filtered_obs = Patient.observations[
             (Patient.observations["PATIENT"] == self.patient_id) &
             (Patient.observations["DESCRIPTION"].isin(Patient.PHYSICAL_CHARACTERISTICS + Patient.VITAL_SIGNS))
         ]
 
         if filtered_obs.empty:
-            return None  # No data to plot
+            return filtered_obs
 
         filtered_obs = filtered_obs.copy()
         filtered_obs["DATE"] = pd.to_datetime(filtered_obs["DATE"], errors="coerce")
@@ -272,25 +372,27 @@ class Patient:
         if end_date:
             filtered_obs = filtered_obs[filtered_obs["DATE"] <= pd.to_datetime(end_date)]
 
-        if filtered_obs.empty:
-            return None
+        return filtered_obs
 
 
-        fig, axes = plt.subplots(2, 1, figsize=(12, 10), sharex=True)
+    def generate_vitals_plot(self, start_date=None, end_date=None, max_points=None, as_bytes=False):
+    
+        filtered_obs = self.filter_vitals(start_date, end_date)
+
+        if filtered_obs.empty:
+            return None  # No data to plot
+
+        plt = load_pyplot()
+        fig, axes = plt.subplots(2, 1, figsize=(12, 10), sharex=True, dpi=Patient.PLOT_DPI)
 
-        self.plot_patient_metrics(axes[0], Patient.PHYSICAL_CHARACTERISTICS, filtered_obs, "Physical Characteristics", bbox_to_anchor=(0.5, -0.25), ncol=3)
-        self.plot_patient_metrics(axes[1], Patient.VITAL_SIGNS, filtered_obs, "Vital Signs", bbox_to_anchor=(0.5, -0.5), ncol=4)
+        self.plot_patient_metrics(axes[0], Patient.PHYSICAL_CHARACTERISTICS, filtered_obs, "Physical Characteristics", bbox_to_anchor=(0.5, -0.25), ncol=3, max_points=max_points)
+        self.plot_patient_metrics(axes[1], Patient.VITAL_SIGNS, filtered_obs, "Vital Signs", bbox_to_anchor=(0.5, -0.5), ncol=4, max_points=max_points)
         axes[1].set_xlabel("Date")
         plt.setp(axes[1].xaxis.get_majorticklabels(), rotation=45)
         plt.tight_layout()
         plt.subplots_adjust(hspace=0.45, bottom=0.35)
 
-
-        buf = BytesIO()
-        fig.savefig(buf, format="PNG", bbox_inches="tight")
-        plt.close(fig)
-        buf.seek(0)
-        return Image.open(buf)
+        return Patient.render_figure(fig, as_bytes=as_bytes)
 
 
     def out_of_range_detection(self, dataset):
@@ -377,6 +479,9 @@ class Patient:
         
     def analyze_vitals(self):
         filtered_dataset = Patient.observations[Patient.observations["PATIENT"] == self.patient_id].copy()
+        # groupby().apply() on an empty frame returns a DataFrame, not a Series
+        if filtered_dataset.empty:
+            return None
 
         combined = defaultdict(lambda: {"out_of_range": [], "instabilities": []})
  
@@ -393,8 +498,9 @@ class Patient:
         return dict(combined) if combined else None
 
 
-    def extract_out_of_range_points(self):
-        analyze_vitals_output = self.analyze_vitals()
+    def extract_out_of_range_points(self, analysis=None):
+        # Pass an already computed analyze_vitals() result to avoid running it again
+        analyze_vitals_output = analysis if analysis is not None else self.analyze_vitals()
         if not analyze_vitals_output:
             return []
         out_of_range_points = []
@@ -0,0 +1,136 @@
+import json
+from datetime import date
+import pandas as pd
+from .patient import Patient
+
+
+class PayloadEncoder:
+    """
+    Compact, token-efficient alternative to Patient.get_summary() for tool responses.
+    Records are grouped per measure/vaccine/medication into columnar series, units and
+    descriptions appear once, and dates are day offsets from the previous entry.
+    Time of day is dropped: observations taken on the same day get an offset of 0.
+    """
+
+    FORMAT = (
+        "Dates: 'start' is the first date (YYYY-MM-DD), 'dt' the days since the previous "
+        "entry (first is 0). Observations: 'v' values aligned with 'dt'. "
+        "Medications: 'dur' days each prescription lasted (null if ongoing)."
+    )
+
+    def __init__(self, patient):
+        self.patient = patient
+
+    def encode(self, max_entries=None):
+        return {
+            "format": self.FORMAT,
+            "patient": self._demographics(),
+            "immunizations": self._immunizations(max_entries),
+            "observations": self._observations(max_entries),
+            "medications": self._medications(max_entries),
+        }
+
+    def encode_valid(self):
+        # Same token budget as Patient.get_valid_summary()
+        payload = self.encode()
+        if self.count_tokens(payload) >= 200_000:
+            payload = self.encode(max_entries=200)
+        return payload
+
+    @staticmethod
+    def dumps(payload):
+        # Raw UTF-8 instead of \uXXXX escapes, which cost several tokens per character
+        return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+    @staticmethod
+    def count_tokens(payload):
+        if not isinstance(payload, str):
+            payload = PayloadEncoder.dumps(payload)
+        return len(Patient.get_encoding().encode(payload))
+
+    def token_savings(self, max_entries=None):
+        # Both measured as the model sees them: JSON-encoded tool content
+        markdown_tokens = self.count_tokens(json.dumps(self.patient.get_summary(max_entries)))
+        compact_tokens = self.count_tokens(self.encode(max_entries))
+        saved = markdown_tokens - compact_tokens
+        return {
+            "markdown_tokens": markdown_tokens,
+            "compact_tokens": compact_tokens,
+            "saved_tokens": saved,
+            "saved_pct": round(100 * saved / markdown_tokens, 1) if markdown_tokens else 0.0,
+        }
+
+    def _demographics(self):
+        row = self.patient.patient_row
+        birthdate = pd.to_datetime(row["BIRTHDATE"]).date()
+        demographics = {
+            "name": f"{self.patient.first_name} {self.patient.last_name}",
+            "gender": row["GENDER"],
+        }
+        if pd.notnull(row["DEATHDATE"]):
+            deathdate = pd.to_datetime(row["DEATHDATE"]).date()
+            demographics["age"] = (deathdate - birthdate).days // 365
+            demographics["death_date"] = str(deathdate)
+        else:
+            demographics["age"] = (date.today() - birthdate).days // 365
+        return demographics
+
+    @staticmethod
+    def _patient_rows(table, patient_id, date_column, max_entries):
+        rows = table[table["PATIENT"] == patient_id].copy()
+        rows[date_column] = pd.to_datetime(rows[date_column], utc=True)
+        # Oldest to newest, keeping only the most recent N entries like get_summary()
+        rows = rows.sort_values(by=date_column, ascending=True)
+        if max_entries is not None:
+            rows = rows.tail(max_entries)
+        return rows
+
+    @staticmethod
+    def _date_series(dates):
+        days = dates.dt.tz_localize(None).dt.normalize()
+        deltas = days.diff().dt.days.fillna(0).astype(int)
+        return {"start": str(days.iloc[0].date()), "dt": deltas.tolist()}
+
+    @staticmethod
+    def _compact_value(value):
+        if pd.isnull(value):
+            return None
+        number = pd.to_numeric(value, errors="coerce")
+        if pd.isnull(number):
+            return value
+        return int(number) if float(number).is_integer() else float(number)
+
+    def _immunizations(self, max_entries):
+        rows = self._patient_rows(Patient.immunizations, self.patient.patient_id, "DATE", max_entries)
+        return {
+            desc: self._date_series(group["DATE"])
+            for desc, group in rows.groupby("DESCRIPTION", sort=False)
+        }
+
+    def _observations(self, max_entries):
+        rows = self._patient_rows(Patient.observations, self.patient.patient_id, "DATE", max_entries)
+        observations = {}
+        for desc, group in rows.groupby("DESCRIPTION", sort=False):
+            series = self._date_series(group["DATE"])
+            units = group["UNITS"].dropna()
+            if not units.empty:
+                series["unit"] = units.iloc[0]
+            series["v"] = [self._compact_value(v) for v in group["VALUE"]]
+            observations[desc] = series
+        return observations
+
+    def _medications(self, max_entries):
+        rows = self._patient_rows(Patient.medications, self.patient.patient_id, "START", max_entries)
+        rows["STOP"] = pd.to_datetime(rows["STOP"], utc=True)
+        rows["REASONDESCRIPTION"] = rows["REASONDESCRIPTION"].fillna("")
+
+        medications = []
+        for (desc, reason), group in rows.groupby(["DESCRIPTION", "REASONDESCRIPTION"], sort=False):
+            durations = (group["STOP"] - group["START"]).dt.days
+            entry = {"drug": desc}
+            if reason:
+                entry["reason"] = reason
+            entry.update(self._date_series(group["START"]))
+            entry["dur"] = [None if pd.isnull(d) else int(d) for d in durations]
+            medications.append(entry)
+        return medications
@@ -1,6 +1,10 @@
 from cachetools import TTLCache
 import json
+import logging
 from .patient import Patient
+from .payload_encoder import PayloadEncoder
+
+logger = logging.getLogger(__name__)
 
 # --- Patient Cache and Tool Logic ---
 # Up to 150 patients in memory, each valid for 10 minutes
@@ -19,7 +23,11 @@ def get_patient_information(patient_id):
     patient, error = get_patient(patient_id)
     if error:
         return {"error": error}
-    return patient.get_valid_summary()
+    # Columnar JSON instead of the markdown summary: far fewer prompt tokens
+    encoder = PayloadEncoder(patient)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Payload tokens for patient %s: %s", patient_id, encoder.token_savings())
+    return encoder.encode_valid()
 
 def get_vital_plots(patient_id, start_date=None, end_date=None):
     patient, error = get_patient(patient_id)
@@ -119,7 +127,7 @@ def handle_tool_call(message):
         info = get_patient_information(patient_id)
         response =  {
             "role": "tool",
-            "content": json.dumps({"patient_id":patient_id, "info":info}),
+            "content": PayloadEncoder.dumps({"patient_id":patient_id, "info":info}),
             "tool_call_id": tool_call.id
         }
         return response, patient_id, False, None, None